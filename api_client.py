@@ -1,12 +1,41 @@
 import logging as log
-import pprint
+import os
+import uuid
+from datetime import datetime as dt
 
+from pybit.account import Account
+from pybit.exceptions import InvalidRequestError
+from pybit.market import Market
+from pybit.position import Position
+from pybit.trade import Trade
+
+from cache import InstrumentsCache, environment_cache_dir
+from log_format import PrettyFormat, info_enabled
+from order_stream import OrderFillStream
+from transport import BybitHTTP, Http2Adapter, PooledAdapter, http2_available, retry_policy
 from types_1 import *
-from pybit.unified_trading import HTTP
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 20
+INSTRUMENTS_CACHE_TTL = 24 * 60 * 60
+INSTRUMENTS_DISK_CACHE_TTL = 7 * 24 * 60 * 60
+INSTRUMENTS_CACHE_DIR = os.path.join(".cache", "instruments")
+# retCodes for an orderLinkId the exchange already has (derivatives, spot).
+DUPLICATE_ORDER_LINK_ID_CODES = frozenset({110072, 170141})
+
+
+def _optional_params(fields) -> dict:
+    """
+    Builds request parameters from (api_key, value) pairs, skipping unset values.
+    """
+    return {key: value for key, value in fields if value is not None}
+
 
 class ApiClient:
 
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = False, demo: bool = True):
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = False, demo: bool = True,
+                 http2: bool = False, instruments_cache_dir: str = INSTRUMENTS_CACHE_DIR,
+                 order_stream: bool = False):
         """
         Initializes the API client for trading.
         
@@ -14,10 +43,56 @@ class ApiClient:
         :param api_secret: API secret.
         :param testnet: Whether to use the testnet.
         :param demo: Whether to use the demo.
+        :param http2: Whether to send requests over HTTP/2 (requires httpx[http2]).
+        :param instruments_cache_dir: Directory persisting instrument info across runs, None disables it.
+        :param order_stream: Whether to subscribe to the private order WebSocket to await fills.
         """
-        self.session = HTTP(testnet=testnet, demo=demo, api_key=api_key, api_secret=api_secret)
+        self.session = BybitHTTP(testnet=testnet, demo=demo, api_key=api_key, api_secret=api_secret)
+        self._configure_transport(http2)
+        self._instruments_cache = InstrumentsCache(
+            INSTRUMENTS_CACHE_TTL, environment_cache_dir(instruments_cache_dir, self.session.endpoint),
+            INSTRUMENTS_DISK_CACHE_TTL)
+        self.order_stream = OrderFillStream(api_key, api_secret, testnet, demo) if order_stream else None
         log.info("Initialized ApiClient with testnet=%s", testnet)
 
+    def _configure_transport(self, http2: bool = False):
+        """
+        Mounts a pooled keep-alive adapter on the underlying requests session,
+        so consecutive calls reuse the same TCP/TLS connection. With http2 enabled,
+        concurrent calls are multiplexed over a single HTTP/2 connection instead.
+        Both adapters retry transient failures (429/5xx, connection errors) with backoff.
+        """
+        client = self.session.client
+        if http2 and http2_available():
+            adapter = Http2Adapter()
+        else:
+            if http2:
+                log.warning("HTTP/2 requested but httpx[http2] is not installed, using HTTP/1.1")
+            adapter = PooledAdapter(pool_connections=POOL_CONNECTIONS,
+                                    pool_maxsize=POOL_MAXSIZE,
+                                    max_retries=retry_policy())
+        client.mount("https://", adapter)
+        client.headers.update({
+            "User-Agent": "bybit-manager",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive"
+        })
+
+    def close(self):
+        """
+        Closes the order stream, if any, and the underlying HTTP session.
+        """
+        if self.order_stream is not None:
+            self.order_stream.close()
+        self.session.client.close()
+
+    def get_session(self):
+        """
+        Returns the underlying requests session used for all API calls.
+
+        :return: requests.Session instance.
+        """
+        return self.session.client
 
 
     def place_order(self, 
@@ -56,7 +131,7 @@ class ApiClient:
         :param qty: Order quantity.
         :param price: Price (required for limit orders).
         :param time_in_force: Time in force for the order (GTC, IOC, FOK, PostOnly).
-        :param order_link_id: Custom order ID (optional).
+        :param order_link_id: Custom order ID (optional, generated when not set so that retries are idempotent).
         :param is_leverage: Leverage for spot trading (default 0).
         :param order_filter: Order filter (default 'Order', TP/SL order, or Stop order).
         :param market_unit: Unit for qty in spot market orders (baseCoin/quoteCoin).
@@ -76,64 +151,209 @@ class ApiClient:
         :param sl_order_type: Order type when stop loss is triggered (Market, Limit).
         :return: Response from the API.
         """
-        log.info("Placing %s order for %s: %s %s, qty=%s, price=%s", 
-                    order_type.value, symbol, side.value, category.value, qty, price)
+        if info_enabled():
+            log.info("Placing %s order for %s: %s %s, qty=%s, price=%s",
+                     order_type, symbol, side, category, qty, price)
 
+        order_data = {"category": category}
+        order_data.update(self.build_order_request(
+            symbol=symbol, side=side, order_type=order_type, qty=qty, price=price,
+            time_in_force=time_in_force, order_link_id=order_link_id, is_leverage=is_leverage,
+            order_filter=order_filter, market_unit=market_unit, trigger_price=trigger_price,
+            trigger_direction=trigger_direction, trigger_by=trigger_by, take_profit=take_profit,
+            stop_loss=stop_loss, tp_trigger_by=tp_trigger_by, sl_trigger_by=sl_trigger_by,
+            reduce_only=reduce_only, close_on_trigger=close_on_trigger, tp_sl_mode=tp_sl_mode,
+            tp_limit_price=tp_limit_price, sl_limit_price=sl_limit_price,
+            tp_order_type=tp_order_type, sl_order_type=sl_order_type
+        ))
+
+        try:
+            response = self._submit_order(order_data)
+            if info_enabled():
+                log.info("Order placed successfully: %s", PrettyFormat(response))
+            return response
+        except Exception as e:
+            log.error("Failed to place order: %s", PrettyFormat(e))
+            raise
+
+    @staticmethod
+    def build_order_request(symbol: str, 
+                            side: Side, 
+                            order_type: OrderType, 
+                            qty: str, 
+                            price: str = None, 
+                            time_in_force: TimeInForce = TimeInForce.IOC, 
+                            order_link_id: str = None, 
+                            is_leverage: int = 0, 
+                            order_filter: OrderFilter = OrderFilter.ORDER,
+                            market_unit: str = None, 
+                            trigger_price: str = None,
+                            trigger_direction: TriggerDirection = None, 
+                            trigger_by: TriggerBy = None,
+                            take_profit: str = None, 
+                            stop_loss: str = None,
+                            tp_trigger_by: TriggerBy = None, 
+                            sl_trigger_by: TriggerBy = None,
+                            reduce_only: bool = None, 
+                            close_on_trigger: bool = None,
+                            tp_sl_mode: TP_SL_Mode = None,
+                            tp_limit_price: str = None, 
+                            sl_limit_price: str = None,
+                            tp_order_type: TP_SL_OrderType = None, 
+                            sl_order_type: TP_SL_OrderType = None) -> dict:
+        """
+        Builds the API request body of a single order, without the category.
+        Parameters are the same as for place_order.
+
+        :return: Order request body.
+        """
         order_data = {
-            "category": category.value,
             "symbol": symbol,
-            "side": side.value,
-            "orderType": order_type.value,
+            "side": side,
+            "orderType": order_type,
             "qty": qty,
-            "timeInForce": time_in_force.value,
+            "timeInForce": time_in_force,
             "isLeverage": is_leverage,
-            "orderFilter": order_filter.value
+            "orderFilter": order_filter
         }
 
-        if price is not None:
-            order_data["price"] = price
-        if order_link_id:
-            order_data["orderLinkId"] = order_link_id
-        if market_unit:
-            order_data["marketUnit"] = market_unit
-        if trigger_price:
-            order_data["triggerPrice"] = trigger_price
-        if trigger_direction:
-            order_data["triggerDirection"] = trigger_direction.value
-        if trigger_by:
-            order_data["triggerBy"] = trigger_by.value
-        if take_profit:
-            order_data["takeProfit"] = take_profit
-        if stop_loss:
-            order_data["stopLoss"] = stop_loss
-        if tp_trigger_by:
-            order_data["tpTriggerBy"] = tp_trigger_by.value
-        if sl_trigger_by:
-            order_data["slTriggerBy"] = sl_trigger_by.value
-        if reduce_only is not None:
-            order_data["reduceOnly"] = reduce_only
-        if close_on_trigger is not None:
-            order_data["closeOnTrigger"] = close_on_trigger
-        if tp_sl_mode:
-            order_data["tpslMode"] = tp_sl_mode.value
-        if tp_limit_price:
-            order_data["tpLimitPrice"] = tp_limit_price
-        if sl_limit_price:
-            order_data["slLimitPrice"] = sl_limit_price
-        if tp_order_type:
-            order_data["tpOrderType"] = tp_order_type.value
-        if sl_order_type:
-            order_data["slOrderType"] = sl_order_type.value
+        order_data.update(_optional_params((
+            ("price", price),
+            ("orderLinkId", order_link_id or uuid.uuid4().hex),
+            ("marketUnit", market_unit),
+            ("triggerPrice", trigger_price),
+            ("triggerDirection", trigger_direction),
+            ("triggerBy", trigger_by),
+            ("takeProfit", take_profit),
+            ("stopLoss", stop_loss),
+            ("tpTriggerBy", tp_trigger_by),
+            ("slTriggerBy", sl_trigger_by),
+            ("reduceOnly", reduce_only),
+            ("closeOnTrigger", close_on_trigger),
+            ("tpslMode", tp_sl_mode),
+            ("tpLimitPrice", tp_limit_price),
+            ("slLimitPrice", sl_limit_price),
+            ("tpOrderType", tp_order_type),
+            ("slOrderType", sl_order_type)
+        )))
 
+        return order_data
+
+    def _submit_order(self, order_data: dict) -> dict:
+        """
+        Submits a single order. If the exchange already has its orderLinkId, an earlier attempt
+        whose response was lost placed it, so that order is returned as placed.
+        """
         try:
-            response = self.session.place_order(**order_data)
-            log.info("Order placed successfully: %s", pprint.pformat(response))
+            return self.session.submit("POST", Trade.PLACE_ORDER, order_data, auth=True)
+        except InvalidRequestError as e:
+            if e.status_code not in DUPLICATE_ORDER_LINK_ID_CODES:
+                raise
+            order = self._find_order_by_link_id(order_data["category"], order_data["orderLinkId"])
+            if order is None:
+                raise
+        return self.placed_order_response(order)
+
+    def _find_order_by_link_id(self, category: Category, order_link_id: str) -> dict:
+        """
+        Returns the order with the given orderLinkId, or None if the exchange has no such order.
+        """
+        response = self.session.submit("GET", Trade.GET_OPEN_ORDERS,
+                                       {"category": category, "orderLinkId": order_link_id}, auth=True)
+        orders = response['result']['list']
+        return orders[0] if orders else None
+
+    @staticmethod
+    def placed_order_response(order: dict) -> dict:
+        """
+        Builds a place_order response for an order that an earlier attempt already placed.
+
+        :param order: Order data as returned by the order query endpoint.
+        :return: Response in the shape of a successful place_order call.
+        """
+        log.warning("Order %s was already placed by an earlier attempt", order['orderLinkId'])
+        return {"retCode": 0, "retMsg": "OK",
+                "result": {"orderId": order['orderId'], "orderLinkId": order['orderLinkId']}}
+
+    @staticmethod
+    def duplicate_batch_orders(response: dict) -> list:
+        """
+        Returns the indexes of batch orders rejected because their orderLinkId already exists.
+
+        :param response: Response from the batch endpoint.
+        :return: Indexes into the batch request.
+        """
+        return [index for index, result in enumerate(response['retExtInfo']['list'])
+                if result['code'] in DUPLICATE_ORDER_LINK_ID_CODES]
+
+    @staticmethod
+    def mark_batch_order_placed(response: dict, index: int, order: dict):
+        """
+        Marks a batch order that an earlier attempt already placed as successfully placed.
+
+        :param response: Response from the batch endpoint, updated in place.
+        :param index: Index of the order in the batch.
+        :param order: Order data as returned by the order query endpoint.
+        """
+        log.warning("Batch order %s was already placed by an earlier attempt", order['orderLinkId'])
+        response['result']['list'][index].update(orderId=order['orderId'], orderLinkId=order['orderLinkId'])
+        response['retExtInfo']['list'][index] = {"code": 0, "msg": "OK"}
+
+    @staticmethod
+    def check_batch_result(request: list, response: dict):
+        """
+        Raises if the exchange rejected any order of a batch. The batch endpoint itself
+        succeeds even when some of its orders fail, so every result has to be checked.
+
+        :param request: Order request bodies as sent in the batch.
+        :param response: Response from the batch endpoint.
+        :raises InvalidRequestError: Naming every rejected order.
+        """
+        rejected = [(order, result) for order, result in zip(request, response['retExtInfo']['list'])
+                    if result['code'] != 0]
+        if not rejected:
+            return
+        for order, result in rejected:
+            log.error("Batch order for %s rejected: %s", order['symbol'], result['msg'])
+        raise InvalidRequestError(
+            request=f"POST {Trade.BATCH_PLACE_ORDER}: {[order for order, _ in rejected]}",
+            message="; ".join(f"{order['side']} {order['orderType']} {order['symbol']} "
+                              f"({order['orderLinkId']}) rejected: {result['msg']}"
+                              for order, result in rejected),
+            status_code=rejected[0][1]['code'],
+            time=dt.utcnow().strftime("%H:%M:%S"),
+            resp_headers=None,
+        )
+
+    def place_batch_order(self, category: Category, orders: list):
+        """
+        Places up to 10 orders of the same category in a single request.
+
+        :param category: Product category (spot, linear, inverse, option).
+        :param orders: List of orders, each a dict of place_order keyword arguments without the category.
+        :return: Response from the API, results are listed in the same order as the requests.
+        :raises InvalidRequestError: If any order of the batch was rejected.
+        """
+        if info_enabled():
+            log.info("Placing batch of %s %s orders", len(orders), category)
+
+        request = [self.build_order_request(**order) for order in orders]
+
+        try:
+            response = self.session.submit("POST", Trade.BATCH_PLACE_ORDER,
+                                           {"category": category, "request": request}, auth=True)
+            if info_enabled():
+                log.info("Batch orders placed: %s", PrettyFormat(response))
+            for index in self.duplicate_batch_orders(response):
+                order = self._find_order_by_link_id(category, request[index]['orderLinkId'])
+                if order is not None:
+                    self.mark_batch_order_placed(response, index, order)
+            self.check_batch_result(request, response)
             return response
         except Exception as e:
-            log.error("Failed to place order: %s", pprint.pformat(e))
+            log.error("Failed to place batch orders: %s", PrettyFormat(e))
             raise
 
-
     def get_wallet_balance(self, account_type: AccountType, coin: str = None):
         """
         Get wallet balance for the specified account type and coin.
@@ -144,20 +364,22 @@ class ApiClient:
                      If not provided, it will return non-zero asset information.
         :return: Response from the API with wallet balance information.
         """
-        log.info("Fetching wallet balance for account type %s and coin %s", account_type.value, coin)
+        if info_enabled():
+            log.info("Fetching wallet balance for account type %s and coin %s", account_type, coin)
 
         params = {
-            "accountType": account_type.value
+            "accountType": account_type
         }
         if coin:
             params["coin"] = coin
 
         try:
-            response = self.session.get_wallet_balance(**params)
-            log.info("Wallet balance retrieved successfully: %s", pprint.pformat(response))
+            response = self.session.submit("GET", Account.GET_WALLET_BALANCE, params, auth=True)
+            if info_enabled():
+                log.info("Wallet balance retrieved successfully: %s", PrettyFormat(response))
             return response
         except Exception as e:
-            log.error("Failed to fetch wallet balance: %s", pprint.pformat(e))
+            log.error("Failed to fetch wallet balance: %s", PrettyFormat(e))
             raise
 
     def get_tickers(self, category: Category, symbol: str = None, base_coin: str = None, exp_date: str = None):
@@ -170,11 +392,12 @@ class ApiClient:
         :param exp_date: Expiry date (optional). Applies to options only, e.g., 25DEC22.
         :return: Response from the API with ticker information.
         """
-        log.info("Fetching tickers for category=%s, symbol=%s, base_coin=%s, exp_date=%s", 
-                 category, symbol, base_coin, exp_date)
+        if info_enabled():
+            log.info("Fetching tickers for category=%s, symbol=%s, base_coin=%s, exp_date=%s",
+                     category, symbol, base_coin, exp_date)
 
         params = {
-            "category": category.value
+            "category": category
         }
 
         if symbol:
@@ -185,11 +408,12 @@ class ApiClient:
             params["expDate"] = exp_date
 
         try:
-            response = self.session.get_tickers(**params)
-            log.info("Tickers retrieved successfully: %s", pprint.pformat(response))
+            response = self.session.submit("GET", Market.GET_TICKERS, params)
+            if info_enabled():
+                log.info("Tickers retrieved successfully: %s", PrettyFormat(response))
             return response
         except Exception as e:
-            log.error("Failed to fetch tickers: %s", pprint.pformat(e))
+            log.error("Failed to fetch tickers: %s", PrettyFormat(e))
             raise
 
     def get_order_by_id(self, category: Category, order_id: str):
@@ -200,19 +424,21 @@ class ApiClient:
         :param order_id: The unique ID of the order you want to query.
         :return: Response from the API with the order details.
         """
-        log.info("Fetching order details for order_id=%s in category=%s", order_id, category)
+        if info_enabled():
+            log.info("Fetching order details for order_id=%s in category=%s", order_id, category)
         
         params = {
-            "category": category.value,
+            "category": category,
             "orderId": order_id
         }
         
         try:
-            response = self.session.get_open_orders(**params)
-            log.info("Order details retrieved successfully: %s", pprint.pformat(response))
+            response = self.session.submit("GET", Trade.GET_OPEN_ORDERS, params, auth=True)
+            if info_enabled():
+                log.info("Order details retrieved successfully: %s", PrettyFormat(response))
             return response
         except Exception as e:
-            log.error("Failed to retrieve order details: %s", pprint.pformat(e))
+            log.error("Failed to retrieve order details: %s", PrettyFormat(e))
             raise
 
     def set_trading_stop(self, 
@@ -253,46 +479,38 @@ class ApiClient:
         :param position_idx: Used to identify positions (0 for one-way mode, 1 for hedge Buy, 2 for hedge Sell).
         :return: Response from the API.
         """
-        log.info("Setting trading stop for %s: TP=%s, SL=%s, TS=%s", symbol, take_profit, stop_loss, trailing_stop)
+        if info_enabled():
+            log.info("Setting trading stop for %s: TP=%s, SL=%s, TS=%s", symbol, take_profit, stop_loss, trailing_stop)
 
         order_data = {
-            "category": category.value,
+            "category": category,
             "symbol": symbol,
-            "tpslMode": tpsl_mode.value,
+            "tpslMode": tpsl_mode,
             "positionIdx": position_idx
         }
 
-        if take_profit is not None:
-            order_data["takeProfit"] = take_profit
-        if stop_loss is not None:
-            order_data["stopLoss"] = stop_loss
-        if trailing_stop is not None:
-            order_data["trailingStop"] = trailing_stop
-        if tp_trigger_by:
-            order_data["tpTriggerBy"] = tp_trigger_by.value
-        if sl_trigger_by:
-            order_data["slTriggerBy"] = sl_trigger_by.value
-        if active_price:
-            order_data["activePrice"] = active_price
-        if tp_size:
-            order_data["tpSize"] = tp_size
-        if sl_size:
-            order_data["slSize"] = sl_size
-        if tp_limit_price:
-            order_data["tpLimitPrice"] = tp_limit_price
-        if sl_limit_price:
-            order_data["slLimitPrice"] = sl_limit_price
-        if tp_order_type:
-            order_data["tpOrderType"] = tp_order_type.value
-        if sl_order_type:
-            order_data["slOrderType"] = sl_order_type.value
+        order_data.update(_optional_params((
+            ("takeProfit", take_profit),
+            ("stopLoss", stop_loss),
+            ("trailingStop", trailing_stop),
+            ("tpTriggerBy", tp_trigger_by),
+            ("slTriggerBy", sl_trigger_by),
+            ("activePrice", active_price),
+            ("tpSize", tp_size),
+            ("slSize", sl_size),
+            ("tpLimitPrice", tp_limit_price),
+            ("slLimitPrice", sl_limit_price),
+            ("tpOrderType", tp_order_type),
+            ("slOrderType", sl_order_type)
+        )))
 
         try:
-            response = self.session.set_trading_stop(**order_data)
-            log.info("Trading stop set successfully: %s", pprint.pformat(response))
+            response = self.session.submit("POST", Position.SET_TRADING_STOP, order_data, auth=True)
+            if info_enabled():
+                log.info("Trading stop set successfully: %s", PrettyFormat(response))
             return response
         except Exception as e:
-            log.error("Failed to set trading stop: %s", pprint.pformat(e))
+            log.error("Failed to set trading stop: %s", PrettyFormat(e))
             raise
 
     def get_instruments_info(self, 
@@ -313,11 +531,21 @@ class ApiClient:
         :param cursor: Pagination cursor (optional).
         :return: Response from the API with instrument information.
         """
-        log.info("Fetching instrument info for category=%s, symbol=%s, status=%s, base_coin=%s", 
-                 category, symbol, status, base_coin)
+        cache_key = (category, symbol, status, base_coin, limit, cursor)
+        cached = self._instruments_cache.get(cache_key)
+        if cached is not None:
+            if info_enabled():
+                log.info("Instrument info cache hit for category=%s, symbol=%s (hits=%s, misses=%s)",
+                         category, symbol, self._instruments_cache.hits, self._instruments_cache.misses)
+            return cached
+
+        if info_enabled():
+            log.info("Instrument info cache miss, fetching category=%s, symbol=%s, status=%s, base_coin=%s "
+                     "(hits=%s, misses=%s)", category, symbol, status, base_coin,
+                     self._instruments_cache.hits, self._instruments_cache.misses)
         
         params = {
-            "category": category.value
+            "category": category
         }
         
         if limit:
@@ -332,9 +560,11 @@ class ApiClient:
             params["cursor"] = cursor
 
         try:
-            response = self.session.get_instruments_info(**params)
-            log.info("Instrument info retrieved successfully: %s", pprint.pformat(response))
+            response = self.session.submit("GET", Market.GET_INSTRUMENTS_INFO, params)
+            if info_enabled():
+                log.info("Instrument info retrieved successfully: %s", PrettyFormat(response))
+            self._instruments_cache.set(cache_key, response)
             return response
         except Exception as e:
-            log.error("Failed to fetch instrument info: %s", pprint.pformat(e))
+            log.error("Failed to fetch instrument info: %s", PrettyFormat(e))
             raise
\ No newline at end of file
@@ -0,0 +1,346 @@
+import asyncio
+import logging as log
+from datetime import datetime as dt
+
+import aiohttp
+from pybit import _helpers
+from pybit._http_manager import (DEMO_SUBDOMAIN_MAINNET, DEMO_SUBDOMAIN_TESTNET, DOMAIN_MAIN, HTTP_URL,
+                                 SUBDOMAIN_MAINNET, SUBDOMAIN_TESTNET, TLD_MAIN, generate_signature)
+from pybit.account import Account
+from pybit.exceptions import FailedRequestError, InvalidRequestError
+from pybit.market import Market
+from pybit.trade import Trade
+
+from api_client import (DUPLICATE_ORDER_LINK_ID_CODES, INSTRUMENTS_CACHE_DIR, INSTRUMENTS_CACHE_TTL,
+                        INSTRUMENTS_DISK_CACHE_TTL, ApiClient)
+from cache import InstrumentsCache, environment_cache_dir
+from log_format import PrettyFormat, info_enabled
+from order_stream import OrderFillStream
+from transport import RETRY_STATUSES, RETRY_TOTAL, BybitHTTP, backoff_delay, json_loads
+from types_1 import *
+
+CONNECTION_LIMIT = 20
+KEEPALIVE_TIMEOUT = 60
+RECV_WINDOW = 5000
+REQUEST_TIMEOUT = 10
+# retCodes retried the same way pybit retries them on the synchronous client:
+# recv_window errors (10002), rate limits (10006) and transient server-side errors.
+RETRY_CODES = frozenset({10002, 10006, 30034, 30035, 130035, 130150})
+RETRY_CODE_ATTEMPTS = 3
+RETRY_CODE_DELAY = 3
+RECV_WINDOW_STEP = 2500
+
+
+class AsyncApiClient:
+    """
+    Asynchronous counterpart of ApiClient built on a persistent aiohttp session.
+    Covers the endpoints used by BybitManager, so concurrent calls of an order flow
+    share one connection pool without going through worker threads.
+    """
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = False, demo: bool = True,
+                 instruments_cache_dir: str = INSTRUMENTS_CACHE_DIR, order_stream: bool = False):
+        """
+        Initializes the asynchronous API client for trading.
+
+        :param api_key: API key.
+        :param api_secret: API secret.
+        :param testnet: Whether to use the testnet.
+        :param demo: Whether to use the demo.
+        :param instruments_cache_dir: Directory persisting instrument info across runs, None disables it.
+        :param order_stream: Whether to subscribe to the private order WebSocket to await fills.
+        """
+        self.api_key = api_key
+        self.api_secret = api_secret
+        if demo:
+            subdomain = DEMO_SUBDOMAIN_TESTNET if testnet else DEMO_SUBDOMAIN_MAINNET
+        else:
+            subdomain = SUBDOMAIN_TESTNET if testnet else SUBDOMAIN_MAINNET
+        self.endpoint = HTTP_URL.format(SUBDOMAIN=subdomain, DOMAIN=DOMAIN_MAIN, TLD=TLD_MAIN)
+        self._session = None
+        self._instruments_cache = InstrumentsCache(
+            INSTRUMENTS_CACHE_TTL, environment_cache_dir(instruments_cache_dir, self.endpoint),
+            INSTRUMENTS_DISK_CACHE_TTL)
+        self.order_stream = OrderFillStream(api_key, api_secret, testnet, demo) if order_stream else None
+        log.info("Initialized AsyncApiClient with testnet=%s", testnet)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared aiohttp session, creating it on first use inside the running loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT, keepalive_timeout=KEEPALIVE_TIMEOUT,
+                                             enable_cleanup_closed=True)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                headers={"Content-Type": "application/json", "Accept": "application/json",
+                         "Accept-Encoding": "gzip, deflate", "User-Agent": "bybit-manager"}
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Closes the order stream, if any, and the underlying aiohttp session.
+        """
+        if self.order_stream is not None:
+            self.order_stream.close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _sign(self, payload: str, recv_window: int = RECV_WINDOW) -> dict:
+        """
+        Returns the authentication headers for a request payload, signed the same way pybit does.
+        """
+        timestamp = _helpers.generate_timestamp()
+        signature = generate_signature(False, self.api_secret, f"{timestamp}{self.api_key}{recv_window}{payload}")
+        return {
+            "X-BAPI-API-KEY": self.api_key,
+            "X-BAPI-SIGN": signature,
+            "X-BAPI-SIGN-TYPE": "2",
+            "X-BAPI-TIMESTAMP": str(timestamp),
+            "X-BAPI-RECV-WINDOW": str(recv_window)
+        }
+
+    async def _send(self, method: str, path: str, url: str, data: str, payload: str, auth: bool,
+                    recv_window: int) -> tuple:
+        """
+        Sends a request and returns its status, headers and body. Transient failures (429/5xx,
+        connection errors) are retried with backoff, re-signing every attempt.
+        """
+        for attempt in range(RETRY_TOTAL + 1):
+            headers = self._sign(payload, recv_window) if auth else {}
+            try:
+                async with self._get_session().request(method, url, data=data, headers=headers) as response:
+                    status, resp_headers = response.status, response.headers
+                    body = await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == RETRY_TOTAL:
+                    raise
+                log.warning("Retrying %s %s after %r", method, path, e)
+            else:
+                if status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                    break
+                log.warning("Retrying %s %s after HTTP %s", method, path, status)
+            await asyncio.sleep(backoff_delay(attempt + 1))
+        return status, resp_headers, body
+
+    async def _request(self, method: str, path: str, params: dict, auth: bool = True) -> dict:
+        """
+        Sends a request and returns the decoded response. Besides transport retries, retCodes
+        pybit retries are retried too: recv_window errors with a wider window and rate limits
+        after the limit resets.
+        """
+        payload = BybitHTTP.prepare_payload(method, params)
+        url = f"{self.endpoint}{path}"
+        data = None
+        if method == "GET":
+            if payload:
+                url = f"{url}?{payload}"
+        else:
+            data = payload
+
+        recv_window = RECV_WINDOW
+        for attempt in range(RETRY_CODE_ATTEMPTS):
+            status, resp_headers, body = await self._send(method, path, url, data, payload, auth, recv_window)
+            if status != 200:
+                raise FailedRequestError(
+                    request=f"{method} {path}: {payload}",
+                    message="HTTP status code is not 200.",
+                    status_code=status,
+                    time=dt.utcnow().strftime("%H:%M:%S"),
+                    resp_headers=resp_headers,
+                )
+            result = json_loads(body)
+            ret_code = result["retCode"]
+            if ret_code not in RETRY_CODES or attempt == RETRY_CODE_ATTEMPTS - 1:
+                break
+            delay = RETRY_CODE_DELAY
+            if ret_code == 10002:
+                recv_window += RECV_WINDOW_STEP
+            elif ret_code == 10006 and "X-Bapi-Limit-Reset-Timestamp" in resp_headers:
+                reset_time = int(resp_headers["X-Bapi-Limit-Reset-Timestamp"])
+                delay = max(0, reset_time - _helpers.generate_timestamp()) / 10 ** 3
+            log.warning("Retrying %s %s in %.3fs after retCode %s: %s", method, path, delay, ret_code,
+                        result["retMsg"])
+            await asyncio.sleep(delay)
+
+        if ret_code:
+            raise InvalidRequestError(
+                request=f"{method} {path}: {payload}",
+                message=result["retMsg"],
+                status_code=ret_code,
+                time=dt.utcnow().strftime("%H:%M:%S"),
+                resp_headers=resp_headers,
+            )
+        return result
+
+    async def place_order(self, category: Category, **kwargs):
+        """
+        Places an order. Accepts the same parameters as ApiClient.place_order.
+
+        :param category: Product category (spot, linear, inverse, option).
+        :return: Response from the API.
+        """
+        if info_enabled():
+            log.info("Placing %s order for %s: %s %s, qty=%s, price=%s", kwargs.get("order_type"),
+                     kwargs.get("symbol"), kwargs.get("side"), category, kwargs.get("qty"), kwargs.get("price"))
+
+        order_data = {"category": category}
+        order_data.update(ApiClient.build_order_request(**kwargs))
+
+        try:
+            response = await self._submit_order(order_data)
+            if info_enabled():
+                log.info("Order placed successfully: %s", PrettyFormat(response))
+            return response
+        except Exception as e:
+            log.error("Failed to place order: %s", PrettyFormat(e))
+            raise
+
+    async def _submit_order(self, order_data: dict) -> dict:
+        """
+        Submits a single order, returning it as placed if an earlier attempt already did,
+        like ApiClient._submit_order.
+        """
+        try:
+            return await self._request("POST", Trade.PLACE_ORDER, order_data)
+        except InvalidRequestError as e:
+            if e.status_code not in DUPLICATE_ORDER_LINK_ID_CODES:
+                raise
+            order = await self._find_order_by_link_id(order_data["category"], order_data["orderLinkId"])
+            if order is None:
+                raise
+        return ApiClient.placed_order_response(order)
+
+    async def _find_order_by_link_id(self, category: Category, order_link_id: str) -> dict:
+        """
+        Returns the order with the given orderLinkId, or None if the exchange has no such order.
+        """
+        response = await self._request("GET", Trade.GET_OPEN_ORDERS,
+                                       {"category": category, "orderLinkId": order_link_id})
+        orders = response['result']['list']
+        return orders[0] if orders else None
+
+    async def place_batch_order(self, category: Category, orders: list):
+        """
+        Places up to 10 orders of the same category in a single request.
+
+        :param category: Product category (spot, linear, inverse, option).
+        :param orders: List of orders, each a dict of place_order keyword arguments without the category.
+        :return: Response from the API, results are listed in the same order as the requests.
+        :raises InvalidRequestError: If any order of the batch was rejected.
+        """
+        if info_enabled():
+            log.info("Placing batch of %s %s orders", len(orders), category)
+
+        request = [ApiClient.build_order_request(**order) for order in orders]
+
+        try:
+            response = await self._request("POST", Trade.BATCH_PLACE_ORDER,
+                                           {"category": category, "request": request})
+            if info_enabled():
+                log.info("Batch orders placed: %s", PrettyFormat(response))
+            for index in ApiClient.duplicate_batch_orders(response):
+                order = await self._find_order_by_link_id(category, request[index]['orderLinkId'])
+                if order is not None:
+                    ApiClient.mark_batch_order_placed(response, index, order)
+            ApiClient.check_batch_result(request, response)
+            return response
+        except Exception as e:
+            log.error("Failed to place batch orders: %s", PrettyFormat(e))
+            raise
+
+    async def get_wallet_balance(self, account_type: AccountType, coin: str = None):
+        """
+        Get wallet balance for the specified account type and coin.
+
+        :param account_type: The type of account (CONTRACT, SPOT).
+        :param coin: Coin name, optional (e.g., BTC, USDC). Multiple coins can be passed, separated by a comma.
+        :return: Response from the API with wallet balance information.
+        """
+        if info_enabled():
+            log.info("Fetching wallet balance for account type %s and coin %s", account_type, coin)
+
+        params = {
+            "accountType": account_type
+        }
+        if coin:
+            params["coin"] = coin
+
+        try:
+            response = await self._request("GET", Account.GET_WALLET_BALANCE, params)
+            if info_enabled():
+                log.info("Wallet balance retrieved successfully: %s", PrettyFormat(response))
+            return response
+        except Exception as e:
+            log.error("Failed to fetch wallet balance: %s", PrettyFormat(e))
+            raise
+
+    async def get_order_by_id(self, category: Category, order_id: str):
+        """
+        Query real-time information about a specific order using its order ID.
+
+        :param category: Product category (spot, linear, inverse, option).
+        :param order_id: The unique ID of the order you want to query.
+        :return: Response from the API with the order details.
+        """
+        if info_enabled():
+            log.info("Fetching order details for order_id=%s in category=%s", order_id, category)
+
+        params = {
+            "category": category,
+            "orderId": order_id
+        }
+
+        try:
+            response = await self._request("GET", Trade.GET_OPEN_ORDERS, params)
+            if info_enabled():
+                log.info("Order details retrieved successfully: %s", PrettyFormat(response))
+            return response
+        except Exception as e:
+            log.error("Failed to retrieve order details: %s", PrettyFormat(e))
+            raise
+
+    async def get_instruments_info(self, category: Category, symbol: str = None):
+        """
+        Get instrument information for trading pairs, cached like ApiClient.get_instruments_info.
+
+        :param category: Product type (spot, linear, inverse, option).
+        :param symbol: Symbol name (optional), like BTCUSDT.
+        :return: Response from the API with instrument information.
+        """
+        cache_key = (category, symbol, None, None, None, None)
+        cached = self._instruments_cache.get(cache_key)
+        if cached is not None:
+            if info_enabled():
+                log.info("Instrument info cache hit for category=%s, symbol=%s (hits=%s, misses=%s)",
+                         category, symbol, self._instruments_cache.hits, self._instruments_cache.misses)
+            return cached
+
+        if info_enabled():
+            log.info("Instrument info cache miss, fetching category=%s, symbol=%s (hits=%s, misses=%s)",
+                     category, symbol, self._instruments_cache.hits, self._instruments_cache.misses)
+
+        params = {
+            "category": category
+        }
+        if symbol:
+            params["symbol"] = symbol
+
+        try:
+            response = await self._request("GET", Market.GET_INSTRUMENTS_INFO, params, auth=False)
+            if info_enabled():
+                log.info("Instrument info retrieved successfully: %s", PrettyFormat(response))
+            self._instruments_cache.set(cache_key, response)
+            return response
+        except Exception as e:
+            log.error("Failed to fetch instrument info: %s", PrettyFormat(e))
+            raise
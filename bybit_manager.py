@@ -1,157 +1,245 @@
+import asyncio
+import functools
 import logging
-import math
+from decimal import Decimal
+from typing import TYPE_CHECKING, Union
 from api_client import ApiClient
+from helpers import calculate_target_price, count_decimal_places, format_decimal, round_to_precision
+from order_stream import FINAL_ORDER_STATUSES
 from types_1 import *
 
+if TYPE_CHECKING:
+    from async_api_client import AsyncApiClient
+
 log = logging.getLogger(__name__)
 
+FILL_TIMEOUT = 5
+FILL_POLL_ATTEMPTS = 6
+FILL_POLL_DELAY = 0.1
+
 class BybitManager:
-    def __init__(self, api_client: ApiClient):
+    def __init__(self, api_client: Union[ApiClient, "AsyncApiClient"]):
         self.api_client = api_client
         log.info("BybitManager initialized with API client.")
 
-    def place_market_order_spot_to_usdt(
+    async def place_market_order_spot_to_usdt(
         self, coin: str, side: Side, percent_of_balance: float, 
         tp_percentage: float = None, sl_percentage: float = None
     ):
         """
         Place a spot market order and set take profit and/or stop loss if specified.
+        Independent API calls are issued concurrently.
         """
         symbol = f"{coin}USDT"
-        order_id = self._execute_market_order(symbol, side, percent_of_balance)
-        avg_price = self._get_avg_price(Category.SPOT, order_id)
-        qty = self._get_formatted_balance(coin, symbol)
+        balances, filters = await asyncio.gather(
+            self.get_balances(),
+            self._get_symbol_filters(Category.SPOT, symbol)
+        )
+        order_id = await self._execute_market_order(symbol, side, percent_of_balance, balances)
+        avg_price = await self._get_avg_price(Category.SPOT, order_id)
+        # The coin balance has to be re-read once the order is filled, the snapshot above predates it.
+        balance = await self.get_balance(coin)
+        qty = round_to_precision(balance, filters.qty_precision)
+        if (sl_percentage or tp_percentage) and qty < filters.min_qty:
+            raise ValueError(f"Market order {order_id} filled, but the {symbol} quantity {qty} is below the "
+                             f"minimum order quantity {filters.min_qty}, TP/SL orders were not placed")
 
-        if sl_percentage:
-            self._set_stop_loss(avg_price, qty, symbol, sl_percentage)
-        if tp_percentage:
-            self._set_take_profit(avg_price, qty, symbol, tp_percentage)
+        if sl_percentage and tp_percentage:
+            await self._set_take_profit_and_stop_loss(avg_price, qty, symbol, tp_percentage, sl_percentage,
+                                                      filters.tick_size)
+        elif sl_percentage:
+            await self._set_stop_loss(avg_price, qty, symbol, sl_percentage, filters.tick_size)
+        elif tp_percentage:
+            await self._set_take_profit(avg_price, qty, symbol, tp_percentage, filters.tick_size)
+
+    @staticmethod
+    async def _call(func, *args, **kwargs):
+        """
+        Awaits an API client method. Blocking methods of the synchronous ApiClient
+        are run in the default executor so that they can overlap.
+        """
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
 
-    def _execute_market_order(self, symbol: str, side: Side, percent_of_balance: float) -> str:
+    async def _execute_market_order(self, symbol: str, side: Side, percent_of_balance: float,
+                              balances: dict) -> str:
         """
         Executes a market order and returns the order ID.
         """
-        qty = self._calculate_order_qty(symbol, percent_of_balance)
+        qty = self._calculate_order_qty(symbol, percent_of_balance, balances)
         log.info(f"Executing market order for {symbol} - Side: {side}, Quantity: {qty}, Percent of Balance: {percent_of_balance}%")
-        response = self.api_client.place_order(
+        response = await self._call(
+            self.api_client.place_order,
             category=Category.SPOT, symbol=symbol, side=side, order_type=OrderType.MARKET, 
-            qty=qty, market_unit="quoteCoin"
+            qty=format_decimal(qty), market_unit="quoteCoin"
         )
         return response['result']['orderId']
 
-    def _set_take_profit(self, avg_price: float, qty: float, symbol: str, tp_percentage: float):
+    async def _set_take_profit(self, avg_price: Decimal, qty: Decimal, symbol: str, tp_percentage: float,
+                         tick_size: Decimal):
         """
         Sets a take profit order at a specified percentage above the average price.
         """
-        tp_price = self._calculate_target_price(symbol, avg_price, tp_percentage, is_take_profit=True)
-        self._place_limit_order(symbol, qty, tp_price, Side.SELL)
+        tp_price = calculate_target_price(avg_price, tp_percentage, tick_size, is_take_profit=True)
+        await self._place_limit_order(symbol, qty, tp_price, Side.SELL)
 
-    def _set_stop_loss(self, avg_price: float, qty: float, symbol: str, sl_percentage: float):
+    async def _set_stop_loss(self, avg_price: Decimal, qty: Decimal, symbol: str, sl_percentage: float,
+                       tick_size: Decimal):
         """
         Sets a stop-loss order at a specified percentage below the average price.
         """
-        sl_price = self._calculate_target_price(symbol, avg_price, sl_percentage, is_take_profit=False)
-        self._place_stop_loss(symbol, qty, sl_price)
+        sl_price = calculate_target_price(avg_price, sl_percentage, tick_size, is_take_profit=False)
+        await self._place_stop_loss(symbol, qty, sl_price)
 
-    def _calculate_target_price(self, symbol: str, avg_price: float, percentage: float, is_take_profit: bool) -> float:
+    async def _set_take_profit_and_stop_loss(self, avg_price: Decimal, qty: Decimal, symbol: str,
+                                             tp_percentage: float, sl_percentage: float, tick_size: Decimal):
         """
-        Calculates target price based on percentage for take-profit or stop-loss.
+        Sets both the take profit and the stop-loss orders with a single batch request.
+        Raises InvalidRequestError if the exchange rejects either of them.
         """
-        multiplier = 1 + (percentage / 100) if is_take_profit else 1 - (percentage / 100)
-        target_price = avg_price * multiplier
-        return round(target_price, self._get_price_precision(Category.SPOT, symbol))
+        tp_price = calculate_target_price(avg_price, tp_percentage, tick_size, is_take_profit=True)
+        sl_price = calculate_target_price(avg_price, sl_percentage, tick_size, is_take_profit=False)
+        log.info(f"Placing TP/SL batch for {symbol} - Quantity: {qty}, TP Price: {tp_price}, SL Trigger Price: {sl_price}")
+        response = await self._call(
+            self.api_client.place_batch_order,
+            category=Category.SPOT,
+            orders=[self._limit_order_request(symbol, qty, tp_price, Side.SELL),
+                    self._stop_loss_request(symbol, qty, sl_price)]
+        )
+        log.info(f"TP/SL batch placed: {response['result']['list']}")
+        return response
 
-    def _place_limit_order(self, symbol: str, qty: float, price: float, side: Side, 
-                           time_in_force: TimeInForce = TimeInForce.GTC):
+    async def _place_limit_order(self, symbol: str, qty: Decimal, price: Decimal, side: Side, 
+                                 time_in_force: TimeInForce = TimeInForce.GTC):
         """
         Places a limit order with the given parameters.
         """
         log.info(f"Placing limit order for {symbol} - Side: {side}, Quantity: {qty}, Price: {price}")
-        response = self.api_client.place_order(
-            category=Category.SPOT, symbol=symbol, side=side, order_type=OrderType.LIMIT, 
-            qty=qty, price=price, time_in_force=time_in_force
+        response = await self._call(
+            self.api_client.place_order,
+            category=Category.SPOT, **self._limit_order_request(symbol, qty, price, side, time_in_force)
         )
         log.info(f"Limit order placed successfully: Order ID {response['result']['orderId']}")
         return response['result']['orderId']
 
-    def _place_stop_loss(self, symbol: str, qty: float, trigger_price: float):
+    async def _place_stop_loss(self, symbol: str, qty: Decimal, trigger_price: Decimal):
         """
         Places a stop-loss order.
         """
         log.info(f"Setting stop-loss for {symbol} - Quantity: {qty}, Trigger Price: {trigger_price}")
-        response = self.api_client.place_order(
-            category=Category.SPOT, symbol=symbol, side=Side.SELL, order_type=OrderType.MARKET, 
-            qty=qty, trigger_price=trigger_price, order_filter=OrderFilter.STOP_ORDER
+        response = await self._call(
+            self.api_client.place_order,
+            category=Category.SPOT, **self._stop_loss_request(symbol, qty, trigger_price)
         )
         log.info(f"Stop-loss order placed successfully: {response}")
         return response
 
-    def _get_formatted_balance(self, coin: str, symbol: str) -> float:
+    @staticmethod
+    def _limit_order_request(symbol: str, qty: Decimal, price: Decimal, side: Side,
+                             time_in_force: TimeInForce = TimeInForce.GTC) -> dict:
+        """
+        Builds the place_order arguments of a limit order.
+        """
+        return dict(symbol=symbol, side=side, order_type=OrderType.LIMIT,
+                    qty=format_decimal(qty), price=format_decimal(price), time_in_force=time_in_force)
+
+    @staticmethod
+    def _stop_loss_request(symbol: str, qty: Decimal, trigger_price: Decimal) -> dict:
         """
-        Retrieves and formats the balance for the given coin and symbol.
+        Builds the place_order arguments of a stop-loss order.
         """
-        balance = self.get_balance(coin)
-        precision = self._get_qty_precision(Category.SPOT, symbol)
-        return self._round_to_precision(float(balance), precision)
+        return dict(symbol=symbol, side=Side.SELL, order_type=OrderType.MARKET,
+                    qty=format_decimal(qty), trigger_price=format_decimal(trigger_price),
+                    order_filter=OrderFilter.STOP_ORDER)
 
-    def get_balance(self, coin: str) -> float:
+    async def get_balance(self, coin: str) -> float:
         """
         Retrieves the balance for a specified coin.
         """
         log.info(f"Fetching balance for {coin}")
-        balance = self.api_client.get_wallet_balance(account_type=AccountType.UNIFIED, coin=coin)
+        balance = await self._call(self.api_client.get_wallet_balance, account_type=AccountType.UNIFIED, coin=coin)
         available_balance = float(balance['result']['list'][0]['coin'][0]['availableToWithdraw'])
         log.info(f"Available balance for {coin}: {available_balance}")
         return available_balance
 
-    def _calculate_order_qty(self, symbol: str, percent_of_balance: float) -> float:
+    async def get_balances(self) -> dict:
         """
-        Calculates quantity based on a percentage of the USDT balance.
+        Retrieves the available balances of all non-zero coins in a single request.
         """
-        usdt_balance = self.get_balance("USDT")
-        qty_in_usdt = usdt_balance * (percent_of_balance / 100)
-        log.info(f"Calculated quantity for {symbol}: {qty_in_usdt}")
-        return round(qty_in_usdt, 0)
+        log.info("Fetching balances for all coins")
+        wallet = await self._call(self.api_client.get_wallet_balance, account_type=AccountType.UNIFIED)
+        balances = {entry['coin']: float(entry['availableToWithdraw'])
+                    for entry in wallet['result']['list'][0]['coin']}
+        log.info(f"Available balances: {balances}")
+        return balances
 
-    def _get_avg_price(self, category: Category, order_id: str) -> float:
+    def _calculate_order_qty(self, symbol: str, percent_of_balance: float, balances: dict) -> Decimal:
         """
-        Retrieves the average price for a completed order.
+        Calculates quantity based on a percentage of the USDT balance.
         """
-        order_data = self.api_client.get_order_by_id(category=category, order_id=order_id)
-        return float(order_data['result']['list'][0]['avgPrice'])
+        if "USDT" not in balances:
+            raise ValueError(f"No USDT balance available for the {symbol} order")
+        usdt_balance = balances["USDT"]
+        qty_in_usdt = usdt_balance * (percent_of_balance / 100)
+        log.info(f"Calculated quantity for {symbol}: {qty_in_usdt}")
+        qty = round_to_precision(qty_in_usdt, 0)
+        if not qty:
+            raise ValueError(f"{percent_of_balance}% of the USDT balance {usdt_balance} is less than 1 USDT")
+        return qty
 
-    def _get_qty_precision(self, category: Category, symbol: str) -> int:
+    async def _get_avg_price(self, category: Category, order_id: str) -> Decimal:
         """
-        Retrieves the precision for quantity values based on the lot size filter.
+        Retrieves the average price for a completed order. Awaits the fill on the order
+        stream when the API client has one, otherwise polls the order with backoff.
+        Returns only once the order has reached a final status, so reads that depend on
+        the fill, such as the coin balance, must be issued after it and not alongside it.
         """
-        lot_size_filter = self.api_client.get_instruments_info(category=category, symbol=symbol)
-        precision_str = lot_size_filter['result']['list'][0]['lotSizeFilter']['basePrecision']
-        return self._count_decimal_places(precision_str)
+        order_stream = getattr(self.api_client, "order_stream", None)
+        if order_stream is not None:
+            try:
+                order = await asyncio.wait_for(order_stream.wait_for_order(order_id), FILL_TIMEOUT)
+                return self._parse_avg_price(order)
+            except asyncio.TimeoutError:
+                log.warning(f"No fill for order {order_id} on the order stream after {FILL_TIMEOUT}s, polling instead")
 
-    def _get_price_precision(self, category: Category, symbol: str) -> int:
-        """
-        Retrieves the precision for price values based on the tick size filter.
-        """
-        tick_size_filter = self.api_client.get_instruments_info(category=category, symbol=symbol)
-        precision_str = tick_size_filter['result']['list'][0]['priceFilter']['tickSize']
-        return self._count_decimal_places(precision_str)
+        delay = FILL_POLL_DELAY
+        for attempt in range(FILL_POLL_ATTEMPTS):
+            order_data = await self._call(self.api_client.get_order_by_id, category=category, order_id=order_id)
+            orders = order_data['result']['list']
+            if orders and orders[0]['orderStatus'] in FINAL_ORDER_STATUSES:
+                return self._parse_avg_price(orders[0])
+            if attempt == FILL_POLL_ATTEMPTS - 1:
+                break
+            log.info(f"Order {order_id} is not filled yet, retrying in {delay}s")
+            await asyncio.sleep(delay)
+            delay *= 2
+        raise TimeoutError(f"Order {order_id} was not filled after {FILL_POLL_ATTEMPTS} checks")
 
     @staticmethod
-    def _count_decimal_places(value: str) -> int:
+    def _parse_avg_price(order: dict) -> Decimal:
         """
-        Counts the decimal places in a given string representation of a number.
+        Returns the average fill price of an order in a final status.
         """
-        if '.' in value:
-            return len(value.split('.')[1])
-        return 0
+        avg_price = Decimal(order['avgPrice'] or 0)
+        if not avg_price:
+            raise ValueError(f"Order {order['orderId']} finished as {order['orderStatus']} without a fill")
+        return avg_price
 
-    @staticmethod
-    def _round_to_precision(value: float, precision: int) -> float:
+    async def _get_symbol_filters(self, category: Category, symbol: str) -> SymbolFilters:
         """
-        Rounds a value down to a specified decimal precision.
+        Retrieves the trading filters of a symbol from a single instrument info request.
+        Instrument info is cached by the API client, so filter changes are picked up once it expires.
         """
-        factor = 10 ** precision
-        return math.floor(value * factor) / factor
+        instruments_info = await self._call(self.api_client.get_instruments_info, category=category, symbol=symbol)
+        instrument = instruments_info['result']['list'][0]
+        lot_size_filter = instrument['lotSizeFilter']
+        return SymbolFilters(
+            qty_precision=count_decimal_places(lot_size_filter['basePrecision']),
+            min_qty=Decimal(lot_size_filter['minOrderQty']),
+            tick_size=Decimal(instrument['priceFilter']['tickSize'])
+        )
 
     
 
@@ -160,7 +248,7 @@ class BybitManager:
         avg_price = self._get_avg_price_of_order(category=category, order_id=order_id)
         take_profit_price = avg_price * (1 + take_profit_percentage / 100)
 
-        log.info(f"Setting FULL take profit for {symbol}: TP Price={take_profit_price:.4f}, Type={TP_SL_Mode.FULL.value}")
+        log.info(f"Setting FULL take profit for {symbol}: TP Price={take_profit_price:.4f}, Type={TP_SL_Mode.FULL}")
         response = self.api_client.set_trading_stop(
             category=Category.LINEAR,
             symbol=symbol,
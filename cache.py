@@ -0,0 +1,140 @@
+import json
+import logging as log
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+DEFAULT_MAXSIZE = 512
+
+
+def environment_cache_dir(directory: str, endpoint: str) -> str:
+    """
+    Returns the cache subdirectory for the API environment of an endpoint, so mainnet,
+    testnet and demo clients never read each other's data. None keeps the disk cache disabled.
+    """
+    if not directory:
+        return None
+    return os.path.join(directory, urlsplit(endpoint).netloc)
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache whose entries expire after ttl seconds. Holds at most
+    maxsize entries, evicting the oldest first. Keeps hit and miss counts for logging.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = DEFAULT_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value for the key, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.monotonic() - entry[0] < self.ttl:
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """
+        Stores a value under the key, evicting the oldest entries beyond maxsize.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class DiskCache:
+    """
+    JSON file cache that persists entries across process runs. Entries expire after ttl seconds.
+    """
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, name: str):
+        """
+        Returns the stored value, or None if the file is missing, expired or unreadable.
+        """
+        try:
+            with open(self._path(name)) as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable cache file %s: %s", self._path(name), e)
+            return None
+        if time.time() - entry["ts"] >= self.ttl:
+            return None
+        return entry["data"]
+
+    def set(self, name: str, value):
+        """
+        Stores a value, replacing the file atomically so readers never see a partial write.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp", delete=False) as file:
+                json.dump({"ts": time.time(), "data": value}, file)
+            os.replace(file.name, self._path(name))
+        except OSError as e:
+            log.warning("Failed to write cache file %s: %s", self._path(name), e)
+
+
+class InstrumentsCache(TTLCache):
+    """
+    Two-level cache for instrument info: in memory, backed by a DiskCache for
+    single-symbol lookups, which are keyed as {category}_{symbol}.
+    """
+
+    def __init__(self, ttl: float, directory: str = None, disk_ttl: float = None,
+                 maxsize: int = DEFAULT_MAXSIZE):
+        super().__init__(ttl, maxsize)
+        self.disk = DiskCache(directory, disk_ttl) if directory else None
+
+    @staticmethod
+    def _disk_name(key):
+        """
+        Returns the file name for (category, symbol, *filters) keys without extra filters.
+        """
+        category, symbol, *filters = key
+        if symbol and not any(filters):
+            return f"{category}_{symbol}"
+        return None
+
+    def get(self, key):
+        value = super().get(key)
+        if value is None and self.disk is not None:
+            name = self._disk_name(key)
+            if name is not None:
+                value = self.disk.get(name)
+                if value is not None:
+                    log.info("Instrument info for %s loaded from disk cache", name)
+                    super().set(key, value)
+        return value
+
+    def set(self, key, value):
+        super().set(key, value)
+        if self.disk is not None:
+            name = self._disk_name(key)
+            if name is not None:
+                self.disk.set(name, value)
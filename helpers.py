@@ -0,0 +1,44 @@
+from decimal import ROUND_DOWN, ROUND_HALF_EVEN, Decimal
+from typing import Union
+
+# Pure numeric helpers used on every order. Kept free of project imports and
+# fully annotated so the module can be AOT-compiled in place with `mypyc helpers.py`.
+# Values are handled as Decimal so that quantities and prices sent to the API
+# carry exactly the exchange precision, without float artifacts.
+
+_ONE = Decimal(1)
+_HUNDRED = Decimal(100)
+
+
+def count_decimal_places(value: str) -> int:
+    """
+    Counts the significant decimal places in a given string representation of a number,
+    ignoring trailing zeros (e.g. "0.000100" -> 4).
+    """
+    return max(0, -Decimal(value).normalize().as_tuple().exponent)
+
+
+def round_to_precision(value: Union[float, str, Decimal], precision: int) -> Decimal:
+    """
+    Rounds a value down to a specified decimal precision.
+    """
+    return Decimal(str(value)).quantize(_ONE.scaleb(-precision), rounding=ROUND_DOWN)
+
+
+def calculate_target_price(avg_price: Decimal, percentage: float, tick_size: Decimal,
+                           is_take_profit: bool) -> Decimal:
+    """
+    Calculates target price based on percentage for take-profit or stop-loss,
+    snapped to the nearest multiple of the tick size.
+    """
+    change = Decimal(str(percentage)) / _HUNDRED
+    multiplier = _ONE + change if is_take_profit else _ONE - change
+    ticks = (avg_price * multiplier / tick_size).to_integral_value(rounding=ROUND_HALF_EVEN)
+    return (ticks * tick_size).quantize(tick_size)
+
+
+def format_decimal(value: Decimal) -> str:
+    """
+    Formats a Decimal in plain (non-scientific) notation, as the API expects.
+    """
+    return format(value, 'f')
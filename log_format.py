@@ -0,0 +1,22 @@
+import logging as log
+import pprint
+
+
+def info_enabled() -> bool:
+    """
+    Whether INFO records are emitted, checked on hot paths before building log arguments.
+    """
+    return log.root.isEnabledFor(log.INFO)
+
+
+class PrettyFormat:
+    """
+    Defers pprint formatting of a log argument until a handler actually emits the record.
+    """
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return pprint.pformat(self.obj)
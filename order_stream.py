@@ -0,0 +1,88 @@
+import asyncio
+import logging as log
+import threading
+from collections import OrderedDict
+
+from pybit.unified_trading import WebSocket
+
+# Order statuses after which an order no longer changes.
+FINAL_ORDER_STATUSES = frozenset({"Filled", "PartiallyFilledCanceled", "Cancelled", "Rejected", "Deactivated"})
+# Finished orders nobody waited for yet, kept in case the push arrives before the wait starts.
+MAX_BUFFERED_ORDERS = 1000
+
+
+def _resolve(future: asyncio.Future, order: dict):
+    if not future.done():
+        future.set_result(order)
+
+
+class OrderFillStream:
+    """
+    Subscribes to the private WebSocket order topic and hands out orders once they
+    reach a final status, so the order flow can await a fill instead of polling REST.
+    """
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = False, demo: bool = True):
+        """
+        Opens the private WebSocket connection and subscribes to order updates.
+
+        :param api_key: API key.
+        :param api_secret: API secret.
+        :param testnet: Whether to use the testnet.
+        :param demo: Whether to use the demo.
+        """
+        self._lock = threading.Lock()
+        self._finished = OrderedDict()
+        self._waiters = {}
+        self._ws = WebSocket(channel_type="private", testnet=testnet, demo=demo,
+                             api_key=api_key, api_secret=api_secret)
+        self._ws.order_stream(callback=self._handle_message)
+        log.info("Subscribed to the private order stream")
+
+    def _handle_message(self, message: dict):
+        """
+        Called from the WebSocket thread for every order update.
+        """
+        for order in message.get("data", []):
+            if order.get("orderStatus") not in FINAL_ORDER_STATUSES:
+                continue
+            order_id = order["orderId"]
+            with self._lock:
+                waiters = self._waiters.pop(order_id, [])
+                if not waiters:
+                    self._finished[order_id] = order
+                    if len(self._finished) > MAX_BUFFERED_ORDERS:
+                        self._finished.popitem(last=False)
+            for loop, future in waiters:
+                loop.call_soon_threadsafe(_resolve, future, order)
+
+    async def wait_for_order(self, order_id: str) -> dict:
+        """
+        Waits until the order reaches a final status and returns its last update.
+
+        :param order_id: The order ID to wait for.
+        :return: Order data as pushed by the order topic.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            order = self._finished.pop(order_id, None)
+            if order is not None:
+                return order
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.setdefault(order_id, []).append(waiter)
+        try:
+            return await future
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(order_id)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[order_id]
+
+    def close(self):
+        """
+        Closes the WebSocket connection.
+        """
+        self._ws.exit()
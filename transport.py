@@ -0,0 +1,226 @@
+import json
+import logging as log
+import os
+import ssl
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import select_proxy
+from urllib3.util.retry import Retry
+from pybit.unified_trading import HTTP
+
+try:
+    import httpx
+except ImportError:  # optional dependency, HTTP/2 is unavailable without it
+    httpx = None
+
+try:
+    import orjson
+except ImportError:  # optional dependency, falls back to the stdlib json
+    orjson = None
+
+KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 60
+# Connection-specific headers are not allowed on HTTP/2 streams.
+HOP_BY_HOP_HEADERS = frozenset({"connection", "keep-alive", "transfer-encoding", "upgrade"})
+# Transient failures are retried with exponential backoff. POST is included because orders
+# carry an orderLinkId, which Bybit uses to reject duplicates of an already accepted order.
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.2
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_METHODS = frozenset({"GET", "POST"})
+# Body parameters pybit casts before serializing, see _V5HTTPManager.prepare_payload.
+STRING_PARAMS = ("qty", "price", "triggerPrice", "takeProfit", "stopLoss")
+INTEGER_PARAMS = ("positionIdx",)
+
+
+def retry_policy() -> Retry:
+    """
+    Returns the urllib3 retry policy mounted on the pooled HTTP/1.1 adapter.
+    The last response is handed back to pybit instead of raising, so its error handling still applies.
+    """
+    return Retry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR, status_forcelist=RETRY_STATUSES,
+                 allowed_methods=RETRY_METHODS, raise_on_status=False)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Returns the delay in seconds before the given retry attempt, starting at 1.
+    """
+    return RETRY_BACKOFF_FACTOR * 2 ** (attempt - 1)
+
+
+class BybitHTTP(HTTP):
+    """
+    pybit HTTP session that encodes request bodies with orjson when it is installed.
+    """
+
+    def submit(self, method: str, path: str, query: dict, auth: bool = False):
+        """
+        Submits a prepared parameter dict to an API path directly, bypassing the
+        keyword-argument endpoint wrappers.
+        """
+        return self._submit_request(method=method, path=f"{self.endpoint}{path}", query=query, auth=auth)
+
+    @staticmethod
+    def prepare_payload(method, parameters):
+        if method == "GET" or orjson is None:
+            return HTTP.prepare_payload(method, parameters)
+        for key in STRING_PARAMS:
+            if key in parameters and type(parameters[key]) != str:
+                parameters[key] = str(parameters[key])
+        for key in INTEGER_PARAMS:
+            if key in parameters and type(parameters[key]) != int:
+                parameters[key] = int(parameters[key])
+        return orjson.dumps(parameters).decode()
+
+
+def json_loads(data):
+    """
+    Decodes a JSON document with orjson when it is installed, otherwise with the stdlib json.
+    """
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+class JsonResponse(requests.Response):
+    """
+    requests.Response that decodes its body with orjson when it is installed.
+    """
+
+    def json(self, **kwargs):
+        if orjson is None:
+            return super().json(**kwargs)
+        return orjson.loads(self.content)
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    Connection-pooling requests adapter returning JsonResponse objects.
+    """
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        response.__class__ = JsonResponse
+        return response
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    requests transport adapter that sends requests through an HTTP/2 httpx client,
+    so concurrent calls are multiplexed over a single TCP/TLS connection.
+    Honours the verify, cert and proxies settings requests resolves for each request.
+    Requires `httpx[http2]`.
+    """
+
+    def __init__(self, retries: int = RETRY_TOTAL):
+        if httpx is None:
+            raise ImportError("HTTP/2 transport requires httpx: pip install 'httpx[http2]'")
+        super().__init__()
+        self.retries = retries
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get_client(self, verify, cert, proxy):
+        """
+        Returns the httpx client for a TLS and proxy configuration, creating it on first use.
+        httpx binds these settings to the client, so each configuration gets its own.
+        """
+        key = (verify, cert, proxy)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                limits = httpx.Limits(max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+                                      keepalive_expiry=KEEPALIVE_EXPIRY)
+                transport = httpx.HTTPTransport(http2=True, retries=self.retries, limits=limits,
+                                                verify=_ssl_context(verify, cert), proxy=proxy)
+                # Environment proxies are already resolved by requests into the proxy above.
+                client = self._clients[key] = httpx.Client(transport=transport, trust_env=False)
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        client = self._get_client(verify, cert, select_proxy(request.url, proxies))
+        headers = {key: value for key, value in request.headers.items()
+                   if key.lower() not in HOP_BY_HOP_HEADERS}
+        retry = request.method in RETRY_METHODS
+        for attempt in range(RETRY_TOTAL + 1):
+            try:
+                response = client.request(request.method, request.url, headers=headers,
+                                          content=request.body, timeout=timeout)
+            except (httpx.ReadTimeout, httpx.ReadError) as e:
+                # Read errors are retried like urllib3 read retries on the HTTP/1.1 adapter.
+                if not retry or attempt == RETRY_TOTAL:
+                    if isinstance(e, httpx.ReadTimeout):
+                        raise requests.exceptions.ReadTimeout(e, request=request)
+                    raise requests.exceptions.ConnectionError(e, request=request)
+                log.warning("Retrying %s %s after %r", request.method, request.url, e)
+            except httpx.ConnectTimeout as e:
+                raise requests.exceptions.ConnectTimeout(e, request=request)
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.Timeout(e, request=request)
+            except httpx.ProxyError as e:
+                raise requests.exceptions.ProxyError(e, request=request)
+            except httpx.TransportError as e:
+                raise requests.exceptions.ConnectionError(e, request=request)
+            else:
+                if not retry or response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                    break
+                log.warning("Retrying %s %s after HTTP %s", request.method, request.url, response.status_code)
+            time.sleep(backoff_delay(attempt + 1))
+        return self._build_response(request, response)
+
+    @staticmethod
+    def _build_response(request, response) -> requests.Response:
+        """
+        Converts an httpx response into the requests.Response pybit expects.
+        """
+        result = JsonResponse()
+        result.status_code = response.status_code
+        result.headers = CaseInsensitiveDict(response.headers)
+        # httpx has already decoded the body, drop the encoding so requests won't try again.
+        result.headers.pop("Content-Encoding", None)
+        result._content = response.content
+        result.encoding = response.encoding
+        result.reason = response.reason_phrase
+        result.url = str(response.url)
+        result.request = request
+        return result
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+def _ssl_context(verify, cert) -> ssl.SSLContext:
+    """
+    Builds the SSL context for requests' verify (bool or CA bundle path) and cert settings.
+    """
+    if isinstance(verify, str):
+        context = ssl.create_default_context(**{"capath" if os.path.isdir(verify) else "cafile": verify})
+    else:
+        context = httpx.create_ssl_context(verify=verify)
+    if cert:
+        context.load_cert_chain(*((cert,) if isinstance(cert, str) else cert))
+    return context
+
+
+def http2_available() -> bool:
+    """
+    Returns whether the optional HTTP/2 transport can be used.
+    """
+    if httpx is None:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        log.warning("httpx is installed without HTTP/2 support: pip install 'httpx[http2]'")
+        return False
+    return True
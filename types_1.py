@@ -1,48 +1,69 @@
-from enum import Enum
+from dataclasses import dataclass
+from decimal import Decimal
+from enum import Enum, IntEnum
 
-class Category(Enum):
+class StrEnum(str, Enum):
+    """
+    Enum whose members are their string values, so they can be passed to the API as-is.
+    """
+
+    def __str__(self):
+        return self.value
+
+class Category(StrEnum):
     SPOT = "spot"
     LINEAR = "linear"
     INVERSE = "inverse"
     OPTION = "option"
 
-class OrderType(Enum):
+class OrderType(StrEnum):
     MARKET = "Market"
     LIMIT = "Limit"
 
-class Side(Enum):
+class Side(StrEnum):
     BUY = "Buy"
     SELL = "Sell"
 
-class TimeInForce(Enum):
+class TimeInForce(StrEnum):
     GTC = "GTC"
     IOC = "IOC"
     FOK = "FOK"
     POST_ONLY = "PostOnly"
 
-class AccountType(Enum):
+class AccountType(StrEnum):
     SPOT = "SPOT"
     CONTRACT = "CONTRACT"
     UNIFIED = "UNIFIED"
 
-class TriggerDirection(Enum):
+class TriggerDirection(IntEnum):
     RISES_TO = 1
     FALLS_TO = 2
 
-class TriggerBy(Enum):
+class TriggerBy(StrEnum):
     LAST_PRICE = "LastPrice"
     INDEX_PRICE = "IndexPrice"
     MARK_PRICE = "MarkPrice"
 
-class OrderFilter(Enum):
+class OrderFilter(StrEnum):
     ORDER = "Order"
     TP_SL_ORDER = "tpslOrder"
     STOP_ORDER = "StopOrder"
 
-class TP_SL_Mode(Enum):
+class TP_SL_Mode(StrEnum):
     FULL = "Full"
     PARTIAL = "Partial"
 
-class TP_SL_OrderType(Enum):
+class TP_SL_OrderType(StrEnum):
     MARKET = "Market"
-    LIMIT = "Limit"
\ No newline at end of file
+    LIMIT = "Limit"
+
+@dataclass(frozen=True)
+class SymbolFilters:
+    """
+    Trading filters of a symbol parsed from a single instrument info entry.
+    """
+    __slots__ = ("qty_precision", "min_qty", "tick_size")
+
+    qty_precision: int
+    min_qty: Decimal
+    tick_size: Decimal